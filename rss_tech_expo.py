@@ -1,8 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import hashlib
 import os
+import re
+import secrets
+import shutil
 from datetime import datetime
 import uuid
+from PIL import Image
 
 # --- Option Lists ---
 TYPE_OPTIONS = ["Lost", "Found"]
@@ -10,43 +16,119 @@ CATEGORY_OPTIONS = ["Pets", "Electronics", "Bags", "Jewelry", "Personal Items",
 CITY_OPTIONS = ["Kuwait City", "Salmiya", "Hawally", "Jahra", "Farwaniya", "Ahmadi", "Mubarak Al-Kabeer"]
 
 # --- File Config ---
-DATA_FILE = "announcements.csv"
+DATA_FILE = "announcements.parquet"
+LEGACY_CSV = "announcements.csv"
 IMAGES_FOLDER = "announcement_images"
 os.makedirs(IMAGES_FOLDER, exist_ok=True)
 
 # --- Data Handling ---
-def load_data():
-    columns = ["ID", "Type", "Category", "City", "Description",
-               "Image1", "Image2", "Image3", "Phone", "Date",
-               "EventDate", "DeletePassword", "Resolved"]
+COLUMNS = ["ID", "Type", "Category", "City", "Description",
+           "Image1", "Image2", "Image3", "Phone", "Date",
+           "EventDate", "DeletePassword", "Resolved"]
+
+def data_mtime():
+    return os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else 0.0
+
+def hash_password(pw):
+    return hashlib.sha256(pw.encode()).hexdigest()
+
+@st.cache_data
+def load_data(mtime):
+    columns = COLUMNS
+    if not os.path.exists(DATA_FILE) and os.path.exists(LEGACY_CSV):
+        # One-time migration from the old CSV format.
+        df = pd.read_csv(LEGACY_CSV, dtype=str).reindex(columns=columns, fill_value="")
+        df["Resolved"] = df["Resolved"].fillna("").astype(str).str.lower().isin(("true", "1"))
+        df["DeletePassword"] = df["DeletePassword"].fillna("").map(hash_password)
+        df.to_parquet(DATA_FILE, compression="zstd", index=False)
     if os.path.exists(DATA_FILE):
-        df = pd.read_csv(DATA_FILE, dtype=str)
-        for c in columns:
-            if c not in df.columns:
-                df[c] = ""
-        df["Resolved"] = df["Resolved"].fillna("False").astype(str).str.lower().map({
-            "true": True, "false": False, "1": True, "0": False
-        }).fillna(False).astype(bool)
-        return df[columns]
+        df = pd.read_parquet(DATA_FILE)
     else:
-        return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(columns=columns)
+    # Fixed vocabularies -> categoricals, so filter comparisons are int
+    # code compares instead of per-row string compares.
+    df["Type"] = df["Type"].astype(pd.CategoricalDtype([t.lower() for t in TYPE_OPTIONS]))
+    df["Category"] = df["Category"].astype(pd.CategoricalDtype(CATEGORY_OPTIONS))
+    df["City"] = df["City"].astype(pd.CategoricalDtype(CITY_OPTIONS))
+    df["Resolved"] = df["Resolved"].astype(bool)
+    # Arrow-backed strings get a C substring kernel for str.contains, and
+    # the pre-lowered copy makes case-insensitive search a plain match.
+    df["Description"] = df["Description"].astype("string[pyarrow]")
+    df["desc_lower"] = df["Description"].str.lower()
+    # Parse dates once here so filters and the "New!" badge work on
+    # datetime64 columns instead of re-parsing strings every rerun.
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["EventDate"] = pd.to_datetime(df["EventDate"], errors="coerce")
+    # Newest-first once here, so neither page re-sorts per rerun.
+    return df.sort_values("Date", ascending=False, ignore_index=True)
 
 def save_data(df):
-    df.to_csv(DATA_FILE, index=False)
+    frame = df[COLUMNS]
+    # Skip the write entirely if nothing actually changed since this
+    # session's last save (e.g. a re-fired button click).
+    fingerprint = pd.util.hash_pandas_object(frame, index=False).sum()
+    if fingerprint == st.session_state.get("saved_fingerprint") and os.path.exists(DATA_FILE):
+        return
+    # Write-then-rename so a crash mid-write can't corrupt the data file.
+    tmp = DATA_FILE + ".tmp"
+    frame.to_parquet(tmp, compression="zstd", index=False)
+    os.replace(tmp, DATA_FILE)
+    st.session_state.saved_fingerprint = fingerprint
+    load_data.clear()
+    recent_posts.clear()
+    description_index.clear()
+
+@st.cache_data
+def recent_posts(mtime):
+    # load_data already returns newest-first, so "recent" is just the head.
+    return load_data(mtime).head(6).reset_index(drop=True)
+
+TOKEN_RE = re.compile(r"\w+")
+
+@st.cache_resource
+def description_index(mtime):
+    # Token -> row positions, so a one-word search is a dict lookup
+    # instead of a substring scan over every description.
+    index = {}
+    for i, desc in enumerate(load_data(mtime)["desc_lower"].fillna("")):
+        for token in set(TOKEN_RE.findall(desc)):
+            index.setdefault(token, []).append(i)
+    return {token: np.asarray(rows, dtype=np.int32) for token, rows in index.items()}
 
 def save_images(files):
     paths = []
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     for file in files[:3]:
         if file is not None:
-            filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}_{file.name}"
+            # basename() guards against path separators in the client-
+            # supplied filename.
+            filename = f"{timestamp}_{secrets.token_hex(8)}_{os.path.basename(file.name)}"
             filepath = os.path.join(IMAGES_FOLDER, filename)
+            # Stream in chunks; getbuffer() would materialize the whole
+            # upload in memory just to copy it once more.
+            file.seek(0)
             with open(filepath, "wb") as f:
-                f.write(file.getbuffer())
+                shutil.copyfileobj(file, f, length=1 << 20)
+            make_thumbnail(filepath)
             paths.append(filepath)
     while len(paths) < 3:
         paths.append("")
     return paths
 
+def make_thumbnail(filepath):
+    with Image.open(filepath) as im:
+        im.thumbnail((256, 256))
+        im.convert("RGB").save(filepath + ".thumb.jpg", "JPEG", quality=80)
+
+@st.cache_resource
+def thumb_bytes(filepath):
+    thumb = filepath + ".thumb.jpg"
+    if not os.path.exists(thumb):
+        # Backfill for images uploaded before thumbnails existed.
+        make_thumbnail(filepath)
+    with open(thumb, "rb") as f:
+        return f.read()
+
 def try_rerun():
     try:
         if hasattr(st, "rerun"):
@@ -57,7 +139,12 @@ def try_rerun():
         st.info("Please refresh manually to see changes.")
 
 # --- Load Data ---
-df = load_data()
+df = load_data(data_mtime())
+# One directory scan per rerun instead of a stat() per image per card.
+existing_images = {e.path for e in os.scandir(IMAGES_FOLDER)}
+# O(1) ID -> row position for the resolve/delete handlers (load_data
+# returns a fresh 0..N-1 index, so position == label).
+id_to_idx = {post_id: k for k, post_id in enumerate(df["ID"].values)}
 
 # --- Sidebar Navigation ---
 page = st.sidebar.radio("Navigate", ["🏠 Home", "📢 View Announcements"])
@@ -107,7 +194,7 @@ if page == "🏠 Home":
                 st.error("Please set a delete password.")
             else:
                 image_paths = save_images(uploaded_files)
-                new_id = str(len(df) + 1)
+                new_id = uuid.uuid4().hex[:12]
                 new_post = {
                     "ID": new_id,
                     "Type": post_type.lower(),
@@ -118,42 +205,48 @@ if page == "🏠 Home":
                     "Image2": image_paths[1],
                     "Image3": image_paths[2],
                     "Phone": phone,
-                    "Date": datetime.today().strftime("%Y-%m-%d"),
-                    "EventDate": event_date.strftime("%Y-%m-%d"),
-                    "DeletePassword": delete_password.strip(),
+                    "Date": pd.Timestamp.today().normalize(),
+                    "EventDate": pd.Timestamp(event_date),
+                    "DeletePassword": hash_password(delete_password.strip()),
                     "Resolved": False,
+                    "desc_lower": description.lower(),
                 }
-                df.loc[len(df)] = new_post
+                df = pd.concat([df, pd.DataFrame([new_post])], ignore_index=True)
                 save_data(df)
                 st.success("Announcement posted successfully!")
                 st.session_state.show_form = False
                 try_rerun()
 
     st.markdown("### 🆕 Recently Posted Items")
-    recent = df.sort_values("Date", ascending=False).head(6)
+    recent = recent_posts(data_mtime())
     if recent.empty:
         st.info("No posts yet — be the first to add one!")
     else:
+        today = pd.Timestamp.today().normalize()
+        recent = recent.assign(
+            emoji=np.where(recent["Type"].values == "lost", "🔴", "🟢"),
+            is_new=(today - recent["Date"]).dt.days <= 3,
+        )
         cols = st.columns(3)
-        for i, (_, row) in enumerate(recent.iterrows()):
+        for i, row in enumerate(recent.itertuples(index=False)):
             with cols[i % 3]:
                 # --- Images Horizontally ---
-                images = [row["Image1"], row["Image2"], row["Image3"]]
-                images = [img for img in images if img and os.path.exists(img)]
+                images = [row.Image1, row.Image2, row.Image3]
+                images = [img for img in images if img and img in existing_images]
                 if images:
                     img_cols = st.columns(len(images))
                     for j, img_path in enumerate(images):
                         with img_cols[j]:
-                            st.image(img_path, use_container_width=True)
+                            st.image(thumb_bytes(img_path), use_container_width=True)
 
-                st.markdown(f"**{row['Category']}** {'🔴' if row['Type']=='lost' else '🟢'}")
-                st.caption(f"{row['City']} • {row['EventDate']}")
-                if (datetime.today() - pd.to_datetime(row["Date"])).days <= 3:
+                st.markdown(f"**{row.Category}** {row.emoji}")
+                st.caption(f"{row.City} • {row.EventDate.date()}")
+                if row.is_new:
                     st.markdown("🔥 New!")
                 with st.expander("Details / Contact Owner"):
-                    st.write(row["Description"])
-                    st.write(f"📞 {row['Phone']}")
-                    if row["Resolved"]:
+                    st.write(row.Description)
+                    st.write(f"📞 {row.Phone}")
+                    if row.Resolved:
                         st.success("✅ Resolved")
                     else:
                         st.warning("🔴 Not resolved")
@@ -183,67 +276,97 @@ elif page == "📢 View Announcements":
     with col6:
         show_resolved = st.checkbox("Include resolved", value=False)
 
-    filtered = df.copy()
+    # Fuse all filters into one mask so the data is sliced exactly once.
+    m = np.ones(len(df), dtype=bool)
     if filter_type != "All":
-        filtered = filtered[filtered["Type"] == filter_type.lower()]
+        m &= (df["Type"].values == filter_type.lower())
     if filter_city != "All":
-        filtered = filtered[filtered["City"] == filter_city]
+        m &= (df["City"].values == filter_city)
     if filter_category != "All":
-        filtered = filtered[filtered["Category"] == filter_category]
+        m &= (df["Category"].values == filter_category)
     if not show_resolved:
-        filtered = filtered[filtered["Resolved"] == False]
+        m &= ~df["Resolved"].values
     if search_query:
-        filtered = filtered[filtered["Description"].str.contains(search_query, case=False, na=False)]
+        query = search_query.lower().strip()
+        hits = description_index(data_mtime()).get(query) if TOKEN_RE.fullmatch(query) else None
+        if hits is not None:
+            # Whole-word hit in the index: O(matches) instead of a scan.
+            hit_mask = np.zeros(len(df), dtype=bool)
+            hit_mask[hits] = True
+            m &= hit_mask
+        else:
+            m &= df["desc_lower"].str.contains(query, na=False, regex=False).to_numpy(dtype=bool, na_value=False)
     if start_date:
-        filtered = filtered[pd.to_datetime(filtered["EventDate"]) >= pd.to_datetime(start_date)]
+        m &= (df["EventDate"].values >= np.datetime64(start_date))
     if end_date:
-        filtered = filtered[pd.to_datetime(filtered["EventDate"]) <= pd.to_datetime(end_date)]
+        m &= (df["EventDate"].values <= np.datetime64(end_date))
+    filtered = df.iloc[np.flatnonzero(m)]
 
     if filtered.empty:
         st.info("No results found.")
     else:
         st.markdown("### Results")
+        # Only render one page of cards — every card is a handful of
+        # widget messages to the frontend, so widget count dominates.
+        page_size = 12
+        num_pages = (len(filtered) + page_size - 1) // page_size
+        if num_pages > 1:
+            page_num = st.number_input("Page", min_value=1, max_value=num_pages, value=1)
+        else:
+            page_num = 1
+        shown = filtered.iloc[(page_num - 1) * page_size : page_num * page_size]
+        today = pd.Timestamp.today().normalize()
+        shown = shown.assign(
+            emoji=np.where(shown["Type"].values == "lost", "🔴 Lost", "🟢 Found"),
+            is_new=(today - shown["Date"]).dt.days <= 3,
+        )
         cols = st.columns(3)
-        for i, (_, row) in enumerate(filtered.sort_values("Date", ascending=False).iterrows()):
+        for i, row in enumerate(shown.itertuples(index=False)):
             with cols[i % 3]:
                 # --- Images Horizontally ---
-                images = [row["Image1"], row["Image2"], row["Image3"]]
-                images = [img for img in images if img and os.path.exists(img)]
+                images = [row.Image1, row.Image2, row.Image3]
+                images = [img for img in images if img and img in existing_images]
                 if images:
                     img_cols = st.columns(len(images))
                     for j, img_path in enumerate(images):
                         with img_cols[j]:
-                            st.image(img_path, use_container_width=True)
+                            st.image(thumb_bytes(img_path), use_container_width=True)
 
-                st.markdown(f"**{row['Category']}** ({'🔴 Lost' if row['Type']=='lost' else '🟢 Found'})")
-                st.caption(f"{row['City']} • {row['EventDate']}")
-                if (datetime.today() - pd.to_datetime(row["Date"])).days <= 3:
+                st.markdown(f"**{row.Category}** ({row.emoji})")
+                st.caption(f"{row.City} • {row.EventDate.date()}")
+                if row.is_new:
                     st.markdown("🔥 New!")
                 with st.expander("Details / Contact Owner"):
-                    st.write(row["Description"])
-                    st.write(f"📞 {row['Phone']}")
+                    st.write(row.Description)
+                    st.write(f"📞 {row.Phone}")
+                    if row.Resolved:
+                        st.success("✅ Resolved")
+                    else:
+                        st.warning("🔴 Not resolved")
 
+                # Management widgets live in their own collapsed expander
+                # (a sibling — Streamlit forbids nested expanders) so the
+                # frontend skips them until a user actually opens it.
+                with st.expander("Manage post"):
                     # --- Resolved Toggle ---
-                    if row["Resolved"]:
-                        st.success("✅ Resolved")
-                        if st.button(f"Mark as Unresolved ({row['ID']})"):
-                            df.loc[df["ID"] == row["ID"], "Resolved"] = False
+                    if row.Resolved:
+                        if st.button(f"Mark as Unresolved ({row.ID})"):
+                            df.at[id_to_idx[row.ID], "Resolved"] = False
                             save_data(df)
                             st.info("Post marked as unresolved.")
                             try_rerun()
                     else:
-                        st.warning("🔴 Not resolved")
-                        if st.button(f"Mark as Resolved ({row['ID']})"):
-                            df.loc[df["ID"] == row["ID"], "Resolved"] = True
+                        if st.button(f"Mark as Resolved ({row.ID})"):
+                            df.at[id_to_idx[row.ID], "Resolved"] = True
                             save_data(df)
                             st.success("Post marked as resolved.")
                             try_rerun()
 
                     # --- Delete ---
-                    delete_pw = st.text_input(f"Delete password for ID {row['ID']}", type="password", key=f"delete_{row['ID']}")
-                    if st.button(f"Delete Post ({row['ID']})"):
-                        if delete_pw == row["DeletePassword"]:
-                            df = df[df["ID"] != row["ID"]]
+                    delete_pw = st.text_input(f"Delete password for ID {row.ID}", type="password", key=f"delete_{row.ID}")
+                    if st.button(f"Delete Post ({row.ID})"):
+                        if hash_password(delete_pw) == row.DeletePassword:
+                            df = df.drop(index=id_to_idx[row.ID])
                             save_data(df)
                             st.success("Post deleted successfully.")
                             try_rerun()